@@ -0,0 +1,27 @@
+import os
+from dataclasses import dataclass
+from uuid import UUID
+
+from cachetools import TTLCache
+
+CACHE_TTL_SECONDS = int(os.getenv("CACHE_TTL_SECONDS", "60"))
+EXPERIMENT_CACHE_TTL_SECONDS = int(os.getenv("EXPERIMENT_CACHE_TTL_SECONDS", "5"))
+CACHE_MAX_SIZE = int(os.getenv("CACHE_MAX_SIZE", "100000"))
+
+
+@dataclass(frozen=True, slots=True)
+class CachedExperiment:
+    """The subset of an Experiment row needed to serve /api/assign."""
+
+    id: UUID
+    is_active: bool
+    hash_seed: int
+    buckets: tuple[str, ...]
+
+
+# Cache operations never await, so they are atomic with respect to the event
+# loop and need no lock. Entries are per-process and updates only evict in the
+# worker that handled them, so experiments use a short TTL to bound how long
+# other workers serve a stale row. Assignments never change once written.
+experiment_cache: TTLCache[UUID, CachedExperiment] = TTLCache(maxsize=CACHE_MAX_SIZE, ttl=EXPERIMENT_CACHE_TTL_SECONDS)
+assignment_cache: TTLCache[tuple[UUID, str], str] = TTLCache(maxsize=CACHE_MAX_SIZE, ttl=CACHE_TTL_SECONDS)
@@ -1,37 +1,49 @@
-import hashlib
 import logging
 import os
+from bisect import bisect_right
 from datetime import datetime, timezone
 from uuid import UUID
 
-from fastapi import FastAPI, Depends, HTTPException, Query
+import xxhash
+from fastapi import FastAPI, Depends, HTTPException, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy import select, update
+from fastapi.responses import ORJSONResponse
+from pydantic import TypeAdapter
+from sqlalchemy import literal_column, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.cache import CachedExperiment, experiment_cache, assignment_cache
 from app.database import get_db
 from app.models import Experiment, Assignment, FeatureToggle
 from app.schemas import (
     ExperimentCreate, ExperimentUpdate, ExperimentResponse,
-    AssignmentResponse,
+    AssignmentBatchRequest, AssignmentResponse,
     FeatureToggleUpdate, FeatureToggleResponse,
 )
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
 logger = logging.getLogger("ab-service")
 
-app = FastAPI(title="A/B Test Assignment Service", version="1.0.0")
+app = FastAPI(title="A/B Test Assignment Service", version="1.0.0", default_response_class=ORJSONResponse)
 
 allowed_origins = os.getenv("ALLOWED_ORIGINS", "http://localhost:3000,http://localhost:3001").split(",")
 app.add_middleware(
     CORSMiddleware,
     allow_origins=allowed_origins,
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=["GET", "POST", "PUT", "DELETE"],
+    allow_headers=["Content-Type"],
 )
 
 
+# List endpoints validate rows and encode JSON in one pydantic-core pass,
+# bypassing FastAPI's per-response serialization
+experiment_list_adapter = TypeAdapter(list[ExperimentResponse])
+toggle_list_adapter = TypeAdapter(list[FeatureToggleResponse])
+
+
 @app.get("/health")
 async def health_check():
     return {"status": "ok", "service": "ab-service"}
@@ -41,8 +53,10 @@ async def health_check():
 
 @app.get("/api/experiments", response_model=list[ExperimentResponse])
 async def list_experiments(db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(Experiment).order_by(Experiment.created_at.desc()))
-    return result.scalars().all()
+    # Core rows skip ORM hydration; response validation reads them by attribute
+    result = await db.execute(select(Experiment.__table__).order_by(Experiment.created_at.desc()))
+    experiments = experiment_list_adapter.validate_python(result.all(), from_attributes=True)
+    return Response(content=experiment_list_adapter.dump_json(experiments), media_type="application/json")
 
 
 @app.post("/api/experiments", response_model=ExperimentResponse, status_code=201)
@@ -56,7 +70,10 @@ async def create_experiment(payload: ExperimentCreate, db: AsyncSession = Depend
     if split_keys != variant_set:
         raise HTTPException(status_code=400, detail="Traffic split keys must match variant names")
 
-    experiment = Experiment(**payload.model_dump())
+    experiment = Experiment(
+        **payload.model_dump(),
+        cumulative_split=_cumulative_split(payload.variants, payload.traffic_split),
+    )
     db.add(experiment)
     await db.commit()
     await db.refresh(experiment)
@@ -89,9 +106,16 @@ async def update_experiment(experiment_id: UUID, payload: ExperimentUpdate, db:
         if sum(update_data["traffic_split"].values()) != 100:
             raise HTTPException(status_code=400, detail="Traffic split must total 100")
 
+    if "traffic_split" in update_data or "variants" in update_data:
+        update_data["cumulative_split"] = _cumulative_split(
+            update_data.get("variants", experiment.variants),
+            update_data.get("traffic_split", experiment.traffic_split),
+        )
+
     update_data["updated_at"] = datetime.now(timezone.utc)
     await db.execute(update(Experiment).where(Experiment.id == experiment_id).values(**update_data))
     await db.commit()
+    experiment_cache.pop(experiment_id, None)
 
     result = await db.execute(select(Experiment).where(Experiment.id == experiment_id))
     logger.info("Updated experiment: %s", experiment_id)
@@ -106,22 +130,79 @@ async def delete_experiment(experiment_id: UUID, db: AsyncSession = Depends(get_
     await db.execute(Assignment.__table__.delete().where(Assignment.experiment_id == experiment_id))
     await db.execute(Experiment.__table__.delete().where(Experiment.id == experiment_id))
     await db.commit()
+    experiment_cache.pop(experiment_id, None)
     logger.info("Deleted experiment: %s", experiment_id)
 
 
 # --- Assignment ---
 
-def _assign_variant(visitor_id: str, experiment_id: str, variants: list[str], traffic_split: dict[str, int]) -> str:
-    """Deterministically assign a variant based on visitor_id + experiment_id hash."""
-    hash_input = f"{visitor_id}:{experiment_id}"
-    hash_value = int(hashlib.sha256(hash_input.encode()).hexdigest(), 16) % 100
-
+def _cumulative_split(variants: list[str], traffic_split: dict[str, int]) -> list[list[str | int]]:
+    """Precompute [variant, cumulative percentage] pairs in variant order."""
     cumulative = 0
+    pairs = []
     for variant in variants:
         cumulative += traffic_split.get(variant, 0)
-        if hash_value < cumulative:
-            return variant
-    return variants[-1]
+        pairs.append([variant, cumulative])
+    return pairs
+
+
+def _bucket_table(cumulative_split: list[list[str | int]]) -> tuple[str, ...]:
+    """Map each of the 100 hash buckets to its variant.
+
+    The visitor lands in the first variant whose cumulative threshold exceeds
+    the bucket. Resolving this once per experiment load turns the per-request
+    variant search into a single tuple index.
+    """
+    variants = [variant for variant, _ in cumulative_split]
+    thresholds = [cumulative for _, cumulative in cumulative_split]
+    return tuple(variants[min(bisect_right(thresholds, bucket), len(variants) - 1)] for bucket in range(100))
+
+
+def _hash_seed(experiment_id: UUID) -> int:
+    """Fold the experiment id into an xxh3 seed, computed once per experiment load."""
+    return xxhash.xxh3_64_intdigest(experiment_id.bytes)
+
+
+def _assign_variant(visitor_id: str, hash_seed: int, buckets: tuple[str, ...]) -> str:
+    """Deterministically assign a variant based on a visitor_id hash seeded per experiment.
+
+    Bucketing only needs a uniform, stable hash, not a cryptographic one, so
+    xxh3 is used instead of SHA-256. Seeding with the experiment means each
+    request only hashes the visitor_id bytes.
+    """
+    return buckets[xxhash.xxh3_64_intdigest(visitor_id.encode(), seed=hash_seed) % 100]
+
+
+async def _get_experiment(experiment_id: UUID, db: AsyncSession) -> CachedExperiment | None:
+    """Return the experiment from the in-process cache, loading it on a miss."""
+    cached = experiment_cache.get(experiment_id)
+    if cached:
+        return cached
+
+    result = await db.execute(select(Experiment).where(Experiment.id == experiment_id))
+    experiment = result.scalar_one_or_none()
+    if not experiment:
+        return None
+    # Rows created before cumulative_split existed have it NULL
+    cumulative_split = experiment.cumulative_split or _cumulative_split(experiment.variants, experiment.traffic_split)
+    cached = CachedExperiment(
+        id=experiment.id,
+        is_active=experiment.is_active,
+        hash_seed=_hash_seed(experiment.id),
+        buckets=_bucket_table(cumulative_split),
+    )
+    experiment_cache[experiment_id] = cached
+    return cached
+
+
+async def _evict_deleted_experiment(experiment_id: UUID, db: AsyncSession) -> None:
+    """Handle an assignment insert that hit the experiments foreign key.
+
+    This happens when another worker deleted the experiment while this worker
+    still had it cached.
+    """
+    await db.rollback()
+    experiment_cache.pop(experiment_id, None)
 
 
 @app.get("/api/assign", response_model=AssignmentResponse)
@@ -131,50 +212,121 @@ async def assign_variant(
     db: AsyncSession = Depends(get_db),
 ):
     # Check experiment exists and is active
-    result = await db.execute(select(Experiment).where(Experiment.id == experiment_id))
-    experiment = result.scalar_one_or_none()
+    experiment = await _get_experiment(experiment_id, db)
     if not experiment:
         raise HTTPException(status_code=404, detail="Experiment not found")
     if not experiment.is_active:
         raise HTTPException(status_code=400, detail="Experiment is not active")
 
-    # Check for existing assignment
-    result = await db.execute(
-        select(Assignment).where(
-            Assignment.experiment_id == experiment_id,
-            Assignment.visitor_id == visitor_id,
-        )
-    )
-    existing = result.scalar_one_or_none()
-    if existing:
+    # Assignments never change once made, so a cached variant is authoritative
+    cached_variant = assignment_cache.get((experiment_id, visitor_id))
+    if cached_variant:
         return AssignmentResponse(
             visitor_id=visitor_id,
             experiment_id=experiment_id,
-            variant=existing.variant,
+            variant=cached_variant,
             is_new=False,
         )
 
-    # Create new assignment
-    variant = _assign_variant(str(visitor_id), str(experiment_id), experiment.variants, experiment.traffic_split)
-    assignment = Assignment(experiment_id=experiment_id, visitor_id=visitor_id, variant=variant)
-    db.add(assignment)
+    # Insert the assignment, or fetch the existing one, in a single round-trip.
+    # The no-op update makes RETURNING yield the stored row on conflict, and
+    # xmax = 0 only holds for a freshly inserted tuple.
+    variant = _assign_variant(visitor_id, experiment.hash_seed, experiment.buckets)
+    stmt = (
+        insert(Assignment)
+        .values(experiment_id=experiment_id, visitor_id=visitor_id, variant=variant)
+        .on_conflict_do_update(
+            index_elements=[Assignment.experiment_id, Assignment.visitor_id],
+            set_={"variant": Assignment.variant},
+        )
+        .returning(Assignment.variant, literal_column("xmax = 0").label("is_new"))
+    )
+    try:
+        result = await db.execute(stmt)
+    except IntegrityError:
+        await _evict_deleted_experiment(experiment_id, db)
+        raise HTTPException(status_code=404, detail="Experiment not found")
+    variant, is_new = result.one()
     await db.commit()
+    assignment_cache[(experiment_id, visitor_id)] = variant
 
-    logger.info("Assigned visitor %s to variant %s for experiment %s", visitor_id, variant, experiment_id)
+    if is_new:
+        logger.info("Assigned visitor %s to variant %s for experiment %s", visitor_id, variant, experiment_id)
     return AssignmentResponse(
         visitor_id=visitor_id,
         experiment_id=experiment_id,
         variant=variant,
-        is_new=True,
+        is_new=is_new,
     )
 
 
+@app.post("/api/assign/batch", response_model=list[AssignmentResponse])
+async def assign_variants_batch(payload: AssignmentBatchRequest, db: AsyncSession = Depends(get_db)):
+    experiment_id = payload.experiment_id
+    experiment = await _get_experiment(experiment_id, db)
+    if not experiment:
+        raise HTTPException(status_code=404, detail="Experiment not found")
+    if not experiment.is_active:
+        raise HTTPException(status_code=400, detail="Experiment is not active")
+
+    # A multi-row upsert may not touch the same row twice, so dedupe up front
+    variants = {
+        visitor_id: assignment_cache.get((experiment_id, visitor_id))
+        for visitor_id in dict.fromkeys(payload.visitor_ids)
+    }
+    new_visitors = set()
+
+    # Sorted so concurrent batches lock overlapping rows in the same order and
+    # cannot deadlock; response order still follows the variants dict
+    misses = sorted(visitor_id for visitor_id, variant in variants.items() if variant is None)
+    if misses:
+        stmt = (
+            insert(Assignment)
+            .values([
+                {
+                    "experiment_id": experiment_id,
+                    "visitor_id": visitor_id,
+                    "variant": _assign_variant(visitor_id, experiment.hash_seed, experiment.buckets),
+                }
+                for visitor_id in misses
+            ])
+            .on_conflict_do_update(
+                index_elements=[Assignment.experiment_id, Assignment.visitor_id],
+                set_={"variant": Assignment.variant},
+            )
+            .returning(Assignment.visitor_id, Assignment.variant, literal_column("xmax = 0").label("is_new"))
+        )
+        try:
+            result = await db.execute(stmt)
+        except IntegrityError:
+            await _evict_deleted_experiment(experiment_id, db)
+            raise HTTPException(status_code=404, detail="Experiment not found")
+        for visitor_id, variant, is_new in result.all():
+            variants[visitor_id] = variant
+            assignment_cache[(experiment_id, visitor_id)] = variant
+            if is_new:
+                new_visitors.add(visitor_id)
+        await db.commit()
+        logger.info("Batch assigned %d new visitors for experiment %s", len(new_visitors), experiment_id)
+
+    return [
+        AssignmentResponse(
+            visitor_id=visitor_id,
+            experiment_id=experiment_id,
+            variant=variant,
+            is_new=visitor_id in new_visitors,
+        )
+        for visitor_id, variant in variants.items()
+    ]
+
+
 # --- Feature Toggles ---
 
 @app.get("/api/toggles", response_model=list[FeatureToggleResponse])
 async def list_toggles(db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(FeatureToggle).order_by(FeatureToggle.created_at))
-    return result.scalars().all()
+    result = await db.execute(select(FeatureToggle.__table__).order_by(FeatureToggle.created_at))
+    toggles = toggle_list_adapter.validate_python(result.all(), from_attributes=True)
+    return Response(content=toggle_list_adapter.dump_json(toggles), media_type="application/json")
 
 
 @app.put("/api/toggles/{key}", response_model=FeatureToggleResponse)
@@ -1,8 +1,9 @@
 import uuid
 from datetime import datetime, timezone
-from sqlalchemy import Column, String, Boolean, Text, DateTime, ForeignKey
+from sqlalchemy import Column, String, Boolean, Text, DateTime, ForeignKey, UniqueConstraint
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import DeclarativeBase
+from uuid6 import uuid7
 
 
 class Base(DeclarativeBase):
@@ -12,11 +13,14 @@ class Base(DeclarativeBase):
 class Experiment(Base):
     __tablename__ = "experiments"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    # Time-ordered UUIDv7 keys append to the right edge of the primary key index
+    # instead of landing on random leaf pages
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     name = Column(String(255), nullable=False)
     description = Column(Text, default="")
     variants = Column(JSONB, nullable=False, default=["control", "variant"])
     traffic_split = Column(JSONB, nullable=False, default={"control": 50, "variant": 50})
+    cumulative_split = Column(JSONB)
     is_active = Column(Boolean, nullable=False, default=True)
     created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
     updated_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
@@ -24,8 +28,9 @@ class Experiment(Base):
 
 class Assignment(Base):
     __tablename__ = "assignments"
+    __table_args__ = (UniqueConstraint("experiment_id", "visitor_id"),)
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     experiment_id = Column(UUID(as_uuid=True), ForeignKey("experiments.id", ondelete="CASCADE"), nullable=False)
     visitor_id = Column(String(255), nullable=False)
     variant = Column(String(255), nullable=False)
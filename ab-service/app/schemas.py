@@ -1,4 +1,5 @@
 from datetime import datetime
+from typing import Annotated
 from uuid import UUID
 from pydantic import BaseModel, Field
 
@@ -37,6 +38,11 @@ class AssignmentRequest(BaseModel):
     experiment_id: UUID
 
 
+class AssignmentBatchRequest(BaseModel):
+    experiment_id: UUID
+    visitor_ids: list[Annotated[str, Field(min_length=1, max_length=255)]] = Field(..., min_length=1, max_length=1000)
+
+
 class AssignmentResponse(BaseModel):
     visitor_id: str
     experiment_id: UUID
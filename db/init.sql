@@ -1,6 +1,9 @@
 -- Landing Page Tracking System - Database Schema
 -- Pushnami Take-Home Project
 
+-- HyperLogLog sketches for approximate distinct visitor counts (see db/Dockerfile)
+CREATE EXTENSION IF NOT EXISTS hll;
+
 -- Experiments table for A/B testing
 CREATE TABLE IF NOT EXISTS experiments (
     id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
@@ -8,6 +11,7 @@ CREATE TABLE IF NOT EXISTS experiments (
     description TEXT DEFAULT '',
     variants JSONB NOT NULL DEFAULT '["control", "variant"]',
     traffic_split JSONB NOT NULL DEFAULT '{"control": 50, "variant": 50}',
+    cumulative_split JSONB,
     is_active BOOLEAN NOT NULL DEFAULT true,
     created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
     updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
@@ -38,9 +42,10 @@ CREATE TABLE IF NOT EXISTS feature_toggles (
     updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
 );
 
--- Events table for metrics tracking
+-- Events table for metrics tracking, range-partitioned by month so time-bounded
+-- queries (e.g. the stats timeline) only touch recent partitions
 CREATE TABLE IF NOT EXISTS events (
-    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    id UUID NOT NULL DEFAULT gen_random_uuid(),
     visitor_id VARCHAR(255) NOT NULL,
     experiment_id UUID REFERENCES experiments(id) ON DELETE SET NULL,
     variant VARCHAR(255),
@@ -49,22 +54,70 @@ CREATE TABLE IF NOT EXISTS events (
     metadata JSONB DEFAULT '{}',
     page_url TEXT,
     user_agent TEXT,
-    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
-);
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+-- Catches rows for months whose partition has not been created yet
+CREATE TABLE IF NOT EXISTS events_default PARTITION OF events DEFAULT;
+
+-- Creates the current and next monthly partitions; called on metrics-service startup
+CREATE OR REPLACE FUNCTION ensure_events_partitions() RETURNS void AS $$
+DECLARE
+    month_start DATE;
+BEGIN
+    FOR month_start IN
+        SELECT generate_series(date_trunc('month', NOW()), date_trunc('month', NOW()) + INTERVAL '1 month', INTERVAL '1 month')::date
+    LOOP
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS %I PARTITION OF events FOR VALUES FROM (%L) TO (%L)',
+            'events_' || to_char(month_start, 'YYYY_MM'),
+            month_start,
+            month_start + INTERVAL '1 month'
+        );
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT ensure_events_partitions();
 
 CREATE INDEX IF NOT EXISTS idx_events_visitor ON events(visitor_id);
 CREATE INDEX IF NOT EXISTS idx_events_type ON events(event_type);
 CREATE INDEX IF NOT EXISTS idx_events_variant ON events(variant);
-CREATE INDEX IF NOT EXISTS idx_events_experiment ON events(experiment_id);
-CREATE INDEX IF NOT EXISTS idx_events_created ON events(created_at);
+CREATE INDEX IF NOT EXISTS idx_events_experiment_created ON events(experiment_id, created_at DESC) INCLUDE (variant, event_type);
+CREATE INDEX IF NOT EXISTS idx_events_created_brin ON events USING brin(created_at);
+
+-- Pre-aggregated per-variant stats, refreshed periodically by metrics-service.
+-- Visitors are kept as HLL sketches so coarser rollups (per experiment, across
+-- experiments) are sketch unions at query time instead of count(DISTINCT).
+CREATE MATERIALIZED VIEW IF NOT EXISTS mv_variant_stats AS
+SELECT
+    experiment_id,
+    variant,
+    event_type,
+    count(*) AS event_count,
+    hll_add_agg(hll_hash_text(visitor_id)) AS visitor_hll
+FROM events
+GROUP BY experiment_id, variant, event_type;
+
+-- Required for REFRESH MATERIALIZED VIEW CONCURRENTLY
+CREATE UNIQUE INDEX IF NOT EXISTS idx_mv_variant_stats_key ON mv_variant_stats(experiment_id, variant, event_type);
+
+-- Last refresh time per materialized view, so only one metrics-service worker
+-- refreshes per interval
+CREATE TABLE IF NOT EXISTS materialized_view_refreshes (
+    view_name VARCHAR(255) PRIMARY KEY,
+    refreshed_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
 
 -- Seed default experiment
-INSERT INTO experiments (name, description, variants, traffic_split, is_active)
+INSERT INTO experiments (name, description, variants, traffic_split, cumulative_split, is_active)
 VALUES (
     'Landing Page Theme',
     'Test neon vs synthwave cyberpunk theme variants',
     '["neon", "synthwave"]',
     '{"neon": 0, "synthwave": 100}',
+    '[["neon", 0], ["synthwave", 100]]',
     true
 );
 
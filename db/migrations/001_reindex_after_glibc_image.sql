@@ -0,0 +1,12 @@
+-- Run once on a data volume created by the old postgres:16-alpine image.
+--
+-- The database image is now Debian-based (glibc) instead of Alpine (musl), and
+-- the two sort text differently. Text btree indexes built under musl, such as
+-- assignments (experiment_id, visitor_id) and feature_toggles.key, must be
+-- rebuilt before the services use them.
+--
+-- REINDEX DATABASE cannot run inside a transaction block, so run this file
+-- with psql's default autocommit, not with --single-transaction.
+
+REINDEX DATABASE pushnami;
+ALTER DATABASE pushnami REFRESH COLLATION VERSION;
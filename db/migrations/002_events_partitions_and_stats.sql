@@ -0,0 +1,93 @@
+-- Brings a database created from an earlier db/init.sql up to the current
+-- schema. Safe to re-run: every step is skipped once it has been applied.
+-- Requires the hll-enabled image from db/Dockerfile.
+
+BEGIN;
+
+CREATE EXTENSION IF NOT EXISTS hll;
+
+-- Precomputed [variant, cumulative %] pairs. ab-service computes them from
+-- traffic_split when loading a row where this is NULL
+ALTER TABLE experiments ADD COLUMN IF NOT EXISTS cumulative_split JSONB;
+
+-- Creates the current and next monthly partitions; called on metrics-service startup
+CREATE OR REPLACE FUNCTION ensure_events_partitions() RETURNS void AS $$
+DECLARE
+    month_start DATE;
+BEGIN
+    FOR month_start IN
+        SELECT generate_series(date_trunc('month', NOW()), date_trunc('month', NOW()) + INTERVAL '1 month', INTERVAL '1 month')::date
+    LOOP
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS %I PARTITION OF events FOR VALUES FROM (%L) TO (%L)',
+            'events_' || to_char(month_start, 'YYYY_MM'),
+            month_start,
+            month_start + INTERVAL '1 month'
+        );
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Convert events to a table range-partitioned by month. The old table is
+-- renamed out of the way, its rows are copied into the new one, and it is then
+-- dropped. Rows from months before the current one land in events_default.
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'events'::regclass) THEN
+        RETURN;
+    END IF;
+
+    DROP INDEX IF EXISTS idx_events_visitor, idx_events_type, idx_events_variant,
+        idx_events_experiment, idx_events_created;
+    ALTER TABLE events RENAME TO events_unpartitioned;
+    ALTER INDEX events_pkey RENAME TO events_unpartitioned_pkey;
+
+    CREATE TABLE events (
+        id UUID NOT NULL DEFAULT gen_random_uuid(),
+        visitor_id VARCHAR(255) NOT NULL,
+        experiment_id UUID REFERENCES experiments(id) ON DELETE SET NULL,
+        variant VARCHAR(255),
+        event_type VARCHAR(100) NOT NULL,
+        event_name VARCHAR(255),
+        metadata JSONB DEFAULT '{}',
+        page_url TEXT,
+        user_agent TEXT,
+        created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+        PRIMARY KEY (id, created_at)
+    ) PARTITION BY RANGE (created_at);
+
+    CREATE TABLE events_default PARTITION OF events DEFAULT;
+    PERFORM ensure_events_partitions();
+
+    INSERT INTO events (id, visitor_id, experiment_id, variant, event_type, event_name, metadata, page_url, user_agent, created_at)
+    SELECT id, visitor_id, experiment_id, variant, event_type, event_name, metadata, page_url, user_agent, created_at
+    FROM events_unpartitioned;
+
+    DROP TABLE events_unpartitioned;
+END;
+$$;
+
+CREATE INDEX IF NOT EXISTS idx_events_visitor ON events(visitor_id);
+CREATE INDEX IF NOT EXISTS idx_events_type ON events(event_type);
+CREATE INDEX IF NOT EXISTS idx_events_variant ON events(variant);
+CREATE INDEX IF NOT EXISTS idx_events_experiment_created ON events(experiment_id, created_at DESC) INCLUDE (variant, event_type);
+CREATE INDEX IF NOT EXISTS idx_events_created_brin ON events USING brin(created_at);
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS mv_variant_stats AS
+SELECT
+    experiment_id,
+    variant,
+    event_type,
+    count(*) AS event_count,
+    hll_add_agg(hll_hash_text(visitor_id)) AS visitor_hll
+FROM events
+GROUP BY experiment_id, variant, event_type;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_mv_variant_stats_key ON mv_variant_stats(experiment_id, variant, event_type);
+
+CREATE TABLE IF NOT EXISTS materialized_view_refreshes (
+    view_name VARCHAR(255) PRIMARY KEY,
+    refreshed_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+COMMIT;
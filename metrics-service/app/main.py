@@ -1,53 +1,130 @@
+import asyncio
 import logging
 import os
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
 from uuid import UUID
 
+import orjson
 from fastapi import FastAPI, Depends, Query
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy import select, func, text
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import TypeAdapter
+from sqlalchemy import insert, select, text
 from sqlalchemy.ext.asyncio import AsyncSession
+from uuid6 import uuid7
 
-from app.database import get_db
+from app.database import async_session, get_db
+from app.maintenance import (
+    PARTITION_CHECK_INTERVAL_SECONDS, PARTITION_RETRY_INTERVAL_SECONDS, STATS_REFRESH_INTERVAL_SECONDS,
+    ensure_event_partitions, refresh_variant_stats, run_periodically,
+)
 from app.models import Event
 from app.schemas import EventCreate, EventResponse, StatsResponse
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
 logger = logging.getLogger("metrics-service")
 
-app = FastAPI(title="Metrics Service", version="1.0.0")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    maintenance = [
+        asyncio.create_task(run_periodically(
+            ensure_event_partitions, PARTITION_CHECK_INTERVAL_SECONDS, PARTITION_RETRY_INTERVAL_SECONDS,
+        )),
+        asyncio.create_task(run_periodically(refresh_variant_stats, STATS_REFRESH_INTERVAL_SECONDS)),
+    ]
+    yield
+    for task in maintenance:
+        task.cancel()
+
+
+app = FastAPI(title="Metrics Service", version="1.0.0", lifespan=lifespan, default_response_class=ORJSONResponse)
 
 allowed_origins = os.getenv("ALLOWED_ORIGINS", "http://localhost:3000,http://localhost:3001").split(",")
 app.add_middleware(
     CORSMiddleware,
     allow_origins=allowed_origins,
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=["GET", "POST"],
+    allow_headers=["Content-Type"],
 )
 
 
+# List endpoints validate rows and encode JSON in one pydantic-core pass,
+# bypassing FastAPI's per-response serialization
+event_list_adapter = TypeAdapter(list[EventResponse])
+
+
 @app.get("/health")
 async def health_check():
     return {"status": "ok", "service": "metrics-service"}
 
 
+# Built once at import so every request hits SQLAlchemy's compiled statement cache
+insert_event = insert(Event.__table__).returning(
+    Event.id, Event.visitor_id, Event.experiment_id, Event.variant, Event.event_type,
+    Event.event_name, Event.event_metadata.label("event_metadata"), Event.page_url, Event.created_at,
+)
+
+
 @app.post("/api/events", response_model=EventResponse, status_code=201)
 async def create_event(payload: EventCreate, db: AsyncSession = Depends(get_db)):
-    event = Event(**payload.model_dump(by_alias=False))
-    db.add(event)
+    # Dumping by alias yields the table's column keys ("metadata"), so the
+    # payload binds straight to the Core insert without building an ORM object
+    result = await db.execute(insert_event, payload.model_dump(by_alias=True))
+    event = result.one()
     await db.commit()
-    await db.refresh(event)
     logger.info("Event recorded: %s [%s] visitor=%s variant=%s", event.event_type, event.event_name, event.visitor_id, event.variant)
     return event
 
 
+EVENT_COPY_COLUMNS = [
+    "id", "visitor_id", "experiment_id", "variant", "event_type",
+    "event_name", "metadata", "page_url", "user_agent", "created_at",
+]
+
+
 @app.post("/api/events/batch", status_code=201)
 async def create_events_batch(payloads: list[EventCreate], db: AsyncSession = Depends(get_db)):
-    events = [Event(**p.model_dump(by_alias=False)) for p in payloads]
-    db.add_all(events)
+    # Stream rows over asyncpg's binary COPY protocol rather than building ORM
+    # objects and INSERTing them
+    created_at = datetime.now(timezone.utc)
+    records = [
+        (
+            uuid7(), p.visitor_id, p.experiment_id, p.variant, p.event_type,
+            p.event_name, orjson.dumps(p.event_metadata).decode(), p.page_url, p.user_agent, created_at,
+        )
+        for p in payloads
+    ]
+    connection = await db.connection()
+    raw_connection = await connection.get_raw_connection()
+    await raw_connection.driver_connection.copy_records_to_table("events", records=records, columns=EVENT_COPY_COLUMNS)
     await db.commit()
-    logger.info("Batch recorded: %d events", len(events))
-    return {"created": len(events)}
+    logger.info("Batch recorded: %d events", len(records))
+    return {"created": len(records)}
+
+
+EVENT_STREAM_CHUNK_SIZE = 100
+
+
+def _encode_events(rows) -> bytes:
+    """Encode rows as comma-separated JSON objects, without the array brackets."""
+    events = event_list_adapter.validate_python(rows, from_attributes=True)
+    return event_list_adapter.dump_json(events, by_alias=True)[1:-1]
+
+
+async def _stream_events(session: AsyncSession, result, first_rows) -> AsyncIterator[bytes]:
+    """Stream the rest of an already-open result as a JSON array, closing the session at the end."""
+    try:
+        yield b"[" + _encode_events(first_rows)
+        if first_rows:
+            async for rows in result.partitions(EVENT_STREAM_CHUNK_SIZE):
+                yield b"," + _encode_events(rows)
+        yield b"]"
+    finally:
+        await session.close()
 
 
 @app.get("/api/events", response_model=list[EventResponse])
@@ -57,9 +134,12 @@ async def list_events(
     experiment_id: UUID | None = Query(None),
     limit: int = Query(100, ge=1, le=1000),
     offset: int = Query(0, ge=0),
-    db: AsyncSession = Depends(get_db),
 ):
-    query = select(Event)
+    # Select plain columns so rows skip ORM hydration
+    query = select(
+        Event.id, Event.visitor_id, Event.experiment_id, Event.variant, Event.event_type,
+        Event.event_name, Event.event_metadata, Event.page_url, Event.created_at,
+    )
     if variant:
         query = query.where(Event.variant == variant)
     if event_type:
@@ -68,8 +148,20 @@ async def list_events(
         query = query.where(Event.experiment_id == experiment_id)
     query = query.order_by(Event.created_at.desc()).limit(limit).offset(offset)
 
-    result = await db.execute(query)
-    return result.scalars().all()
+    # Rows are fetched through a server-side cursor and encoded as they arrive,
+    # so at most one chunk is held in memory. The cursor is opened and the first
+    # chunk fetched before the response starts, so connection and query errors
+    # still surface as a 500 rather than a truncated 200. The session is opened
+    # here rather than injected because FastAPI closes dependencies before a
+    # streaming body is sent.
+    session = async_session()
+    try:
+        result = await session.stream(query)
+        first_rows = await result.fetchmany(EVENT_STREAM_CHUNK_SIZE)
+    except Exception:
+        await session.close()
+        raise
+    return StreamingResponse(_stream_events(session, result, first_rows), media_type="application/json")
 
 
 @app.get("/api/stats", response_model=StatsResponse)
@@ -77,70 +169,50 @@ async def get_stats(
     experiment_id: UUID | None = Query(None),
     db: AsyncSession = Depends(get_db),
 ):
-    base_filter = Event.experiment_id == experiment_id if experiment_id else True
-
-    # Total events
-    result = await db.execute(select(func.count(Event.id)).where(base_filter))
-    total_events = result.scalar() or 0
-
-    # Unique visitors
-    result = await db.execute(select(func.count(func.distinct(Event.visitor_id))).where(base_filter))
-    unique_visitors = result.scalar() or 0
-
-    # Events by type
-    result = await db.execute(
-        select(Event.event_type, func.count(Event.id))
-        .where(base_filter)
-        .group_by(Event.event_type)
-    )
-    events_by_type = {row[0]: row[1] for row in result.all()}
-
-    # Events by variant
-    result = await db.execute(
-        select(Event.variant, func.count(Event.id))
-        .where(base_filter)
-        .where(Event.variant.isnot(None))
-        .group_by(Event.variant)
-    )
-    events_by_variant = {row[0]: row[1] for row in result.all()}
-
-    # Variant + event_type breakdown
-    result = await db.execute(
-        select(Event.variant, Event.event_type, func.count(Event.id))
-        .where(base_filter)
-        .where(Event.variant.isnot(None))
-        .group_by(Event.variant, Event.event_type)
-    )
-    variant_breakdown = [
-        {"variant": row[0], "event_type": row[1], "count": row[2]}
-        for row in result.all()
-    ]
+    # Aggregates come from the periodically refreshed mv_variant_stats view.
+    # The () grouping set yields the totals; distinct visitors are estimated
+    # from the union of the per-group HLL sketches.
+    where_clause = "WHERE experiment_id = :experiment_id" if experiment_id else ""
+    aggregates_query = text(f"""
+        SELECT
+            variant,
+            event_type,
+            GROUPING(variant, event_type) AS grouping_level,
+            sum(event_count) AS events,
+            hll_cardinality(hll_union_agg(visitor_hll)) AS visitors
+        FROM mv_variant_stats
+        {where_clause}
+        GROUP BY GROUPING SETS ((), (variant, event_type))
+    """)
+    params = {"experiment_id": experiment_id} if experiment_id else {}
+    result = await db.execute(aggregates_query, params)
+
+    total_events = 0
+    unique_visitors = 0
+    events_by_type = {}
+    events_by_variant = {}
+    variant_breakdown = []
+    visitors_by_variant = {}
+    for variant_name, event_type, grouping_level, events, visitors in result.all():
+        events = int(events or 0)
+        visitors = round(visitors or 0)
+        if grouping_level:
+            total_events = events
+            unique_visitors = visitors
+            continue
+        events_by_type[event_type] = events_by_type.get(event_type, 0) + events
+        if variant_name is None:
+            continue
+        events_by_variant[variant_name] = events_by_variant.get(variant_name, 0) + events
+        variant_breakdown.append({"variant": variant_name, "event_type": event_type, "count": events})
+        visitors_by_variant.setdefault(variant_name, {})[event_type] = visitors
 
     # Conversion rates by variant (page_view -> click or form_submit)
     conversion_by_variant = {}
-    for variant_name in events_by_variant:
-        v_filter = (Event.variant == variant_name) & base_filter
-        views_result = await db.execute(
-            select(func.count(func.distinct(Event.visitor_id)))
-            .where(v_filter)
-            .where(Event.event_type == "page_view")
-        )
-        views = views_result.scalar() or 0
-
-        clicks_result = await db.execute(
-            select(func.count(func.distinct(Event.visitor_id)))
-            .where(v_filter)
-            .where(Event.event_type == "click")
-        )
-        clicks = clicks_result.scalar() or 0
-
-        submits_result = await db.execute(
-            select(func.count(func.distinct(Event.visitor_id)))
-            .where(v_filter)
-            .where(Event.event_type == "form_submit")
-        )
-        submits = submits_result.scalar() or 0
-
+    for variant_name, visitors in visitors_by_variant.items():
+        views = visitors.get("page_view", 0)
+        clicks = visitors.get("click", 0)
+        submits = visitors.get("form_submit", 0)
         conversion_by_variant[variant_name] = {
             "views": views,
             "clicks": clicks,
@@ -0,0 +1,73 @@
+import asyncio
+import logging
+import os
+from collections.abc import Awaitable, Callable
+
+from sqlalchemy import text
+
+from app.database import async_session
+
+logger = logging.getLogger("metrics-service")
+
+PARTITION_CHECK_INTERVAL_SECONDS = 6 * 60 * 60
+PARTITION_RETRY_INTERVAL_SECONDS = 60
+STATS_REFRESH_INTERVAL_SECONDS = int(os.getenv("STATS_REFRESH_INTERVAL_SECONDS", "60"))
+
+
+async def ensure_event_partitions() -> None:
+    """Create the current and next monthly events partitions if they are missing.
+
+    Concurrent CREATE TABLE ... PARTITION OF calls can collide in the catalogs,
+    so only the worker holding the advisory lock runs it; the rest skip.
+    """
+    async with async_session() as session:
+        result = await session.execute(text("SELECT pg_try_advisory_xact_lock(hashtext('ensure_events_partitions'))"))
+        if result.scalar():
+            await session.execute(text("SELECT ensure_events_partitions()"))
+        await session.commit()
+
+
+async def refresh_variant_stats() -> None:
+    """Refresh mv_variant_stats at most once per interval across all workers.
+
+    The advisory lock serializes workers, and the recorded refresh time lets
+    the ones that follow skip the round instead of rescanning events.
+    """
+    async with async_session() as session:
+        result = await session.execute(text("SELECT pg_try_advisory_xact_lock(hashtext('mv_variant_stats'))"))
+        if not result.scalar():
+            await session.commit()
+            return
+
+        result = await session.execute(
+            text("""
+                SELECT 1 FROM materialized_view_refreshes
+                WHERE view_name = 'mv_variant_stats'
+                  AND refreshed_at > NOW() - make_interval(secs => :interval)
+            """),
+            {"interval": STATS_REFRESH_INTERVAL_SECONDS},
+        )
+        if result.scalar() is None:
+            await session.execute(text("REFRESH MATERIALIZED VIEW CONCURRENTLY mv_variant_stats"))
+            await session.execute(text("""
+                INSERT INTO materialized_view_refreshes (view_name, refreshed_at)
+                VALUES ('mv_variant_stats', NOW())
+                ON CONFLICT (view_name) DO UPDATE SET refreshed_at = EXCLUDED.refreshed_at
+            """))
+        await session.commit()
+
+
+async def run_periodically(job: Callable[[], Awaitable[None]], interval: int, retry_interval: int | None = None) -> None:
+    """Run a maintenance job for the lifetime of the process, logging failures.
+
+    After a failure the job is retried after retry_interval instead of waiting
+    out the full interval.
+    """
+    while True:
+        try:
+            await job()
+        except Exception:
+            logger.exception("Maintenance job %s failed", job.__name__)
+            await asyncio.sleep(retry_interval or interval)
+            continue
+        await asyncio.sleep(interval)
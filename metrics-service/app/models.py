@@ -1,8 +1,8 @@
-import uuid
 from datetime import datetime, timezone
 from sqlalchemy import Column, String, Text, DateTime, ForeignKey
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import DeclarativeBase
+from uuid6 import uuid7
 
 
 class Base(DeclarativeBase):
@@ -12,7 +12,9 @@ class Base(DeclarativeBase):
 class Event(Base):
     __tablename__ = "events"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    # Time-ordered UUIDv7 keys keep inserts on the right edge of the primary key
+    # index instead of scattering them across random leaf pages
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     visitor_id = Column(String(255), nullable=False)
     experiment_id = Column(UUID(as_uuid=True), nullable=True)
     variant = Column(String(255))